@@ -104,6 +104,14 @@ def simulate_normal_journey(start_time, start_lat, start_lon, num_events):
     else: # 70% chance of walking or stationary
         return simulate_stationary_or_walking_journey(start_time, start_lat, start_lon, num_events)
 
+def apply_bot_replay(events):
+    """Overwrites a journey's sensors with the constant values a replay bot reports."""
+    for event in events:
+        event["horizontal_accuracy"] = 1.0; event["vertical_accuracy"] = 1.0
+        event["num_satellites"] = 25; event["speed"] = DRIVING_SPEED_MPS
+        event["bearing"] = 45
+    return events
+
 def simulate_spoofed_journey(start_time, start_lat, start_lon, num_events):
     """Simulates a journey with one of five spoofing attack types."""
     spoof_type = random.choice([
@@ -131,11 +139,7 @@ def simulate_spoofed_journey(start_time, start_lat, start_lon, num_events):
         return events
 
     if spoof_type == "bot_replay":
-        for event in events:
-            event["horizontal_accuracy"] = 1.0; event["vertical_accuracy"] = 1.0
-            event["num_satellites"] = 25; event["speed"] = DRIVING_SPEED_MPS
-            event["bearing"] = 45
-        return events
+        return apply_bot_replay(events)
 
     if spoof_type == "frozen_location":
         frozen_lat, frozen_lon = events[0]["latitude"], events[0]["longitude"]
@@ -0,0 +1,369 @@
+import zlib
+import pandas as pd
+import numpy as np
+
+# --- Fingerprint Constants ---
+# These can be tuned for better performance
+GEOHASH_PRECISION = 7  # ~150m x 150m cells, roughly one driving step (10s at 15 m/s)
+SHINGLE_SIZE = 3  # Number of consecutive cells that form one shingle
+RECENT_TRACK_EVENTS = 40  # Only the most recent events of an installation are fingerprinted
+NUM_PERMUTATIONS = 64  # Length of the MinHash signature
+NUM_BANDS = 32  # LSH bands; NUM_PERMUTATIONS must be divisible by NUM_BANDS
+REPLAY_SIMILARITY_THRESHOLD = 0.5  # Min estimated Jaccard similarity to call a track a replay
+CONSTANCY_COLUMNS = ['horizontal_accuracy', 'num_satellites', 'speed', 'bearing']
+CONSTANCY_STD_THRESHOLD = 1e-6  # Max std for a sensor to be considered "constant"
+MIN_TRACK_EVENTS = 5  # Tracks shorter than this are too short to fingerprint
+MIN_DISTINCT_CELLS = 4  # Tracks covering fewer cells (e.g. stationary devices) are never replay-matched
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _geohash_encode(lat, lon, precision=GEOHASH_PRECISION):
+    """
+    Encodes a latitude/longitude pair into a geohash string.
+    Internal use function.
+    """
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash = []
+    bits, bit_count, even = 0, 0, True
+
+    while len(geohash) < precision:
+        # Geohash interleaves bits, starting with longitude
+        value, interval = (lon, lon_range) if even else (lat, lat_range)
+        mid = (interval[0] + interval[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            interval[0] = mid
+        else:
+            bits = bits << 1
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            geohash.append(_GEOHASH_BASE32[bits])
+            bits, bit_count = 0, 0
+
+    return ''.join(geohash)
+
+
+def quantize_track(df_track, precision=GEOHASH_PRECISION):
+    """
+    Reduces a time-ordered track to its sequence of geohash cells.
+
+    Consecutive duplicate cells are collapsed, so the sequence describes the
+    path taken rather than how long the device dwelled in each cell.
+
+    Args:
+        df_track (pd.DataFrame): Events of a single installation, sorted by time.
+        precision (int): Geohash precision (number of characters).
+
+    Returns:
+        list: The geohash cells visited, in order.
+    """
+    cells = []
+    for lat, lon in zip(df_track['latitude'], df_track['longitude']):
+        if pd.isna(lat) or pd.isna(lon):
+            continue
+        cell = _geohash_encode(lat, lon, precision)
+        if not cells or cells[-1] != cell:
+            cells.append(cell)
+    return cells
+
+
+def _shingles(cells, size=SHINGLE_SIZE):
+    """
+    Returns the set of hashed k-shingles of a geohash sequence.
+    Sequences shorter than `size` have no shingles.
+    Internal use function.
+    """
+    return {
+        zlib.crc32('|'.join(cells[i:i + size]).encode('utf-8'))
+        for i in range(len(cells) - size + 1)
+    }
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures of shingle sets.
+
+    Uses the universal hash family h(x) = (a * x + b) mod p, seeded so that
+    signatures are comparable across runs.
+    """
+
+    def __init__(self, num_perm=NUM_PERMUTATIONS, seed=42):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, int(_MAX_HASH), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(_MAX_HASH), size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles):
+        """
+        Returns the MinHash signature of a set of 32-bit shingle hashes.
+
+        An empty set has no meaningful signature (any two would match with
+        similarity 1.0), so callers must not fingerprint tracks without cells.
+        """
+        if not shingles:
+            raise ValueError("cannot compute a signature of an empty shingle set")
+        x = np.fromiter(shingles, dtype=np.uint64)[:, None]
+        # Products stay below 2^64 because a, b and x are all below 2^32
+        hashes = ((self.a * x + self.b) % _MERSENNE_PRIME) & _MAX_HASH
+        return hashes.min(axis=0)
+
+
+def estimate_similarity(sig_a, sig_b):
+    """Estimates the Jaccard similarity of two tracks from their signatures."""
+    return float(np.mean(sig_a == sig_b))
+
+
+class TrajectoryIndex:
+    """
+    Locality-sensitive hashing index over MinHash signatures.
+
+    Each signature is split into `num_bands` bands and every band is hashed
+    into its own bucket table. Two tracks become candidates if they collide
+    in at least one band, so a lookup only touches the matching buckets
+    instead of scanning every indexed track.
+    """
+
+    def __init__(self, num_perm=NUM_PERMUTATIONS, num_bands=NUM_BANDS):
+        if num_perm % num_bands != 0:
+            raise ValueError("num_perm must be divisible by num_bands")
+        self.num_bands = num_bands
+        self.rows_per_band = num_perm // num_bands
+        self.buckets = [{} for _ in range(num_bands)]
+        self.signatures = {}
+
+    def _band_keys(self, signature):
+        for band in range(self.num_bands):
+            start = band * self.rows_per_band
+            yield band, signature[start:start + self.rows_per_band].tobytes()
+
+    def add(self, installation_id, signature):
+        """Indexes the signature of an installation's track."""
+        self.signatures[installation_id] = signature
+        for band, key in self._band_keys(signature):
+            self.buckets[band].setdefault(key, set()).add(installation_id)
+
+    def query(self, signature, threshold=REPLAY_SIMILARITY_THRESHOLD):
+        """
+        Finds indexed installations whose track is similar to `signature`.
+
+        Returns:
+            list: (installation_id, similarity) tuples above `threshold`,
+                  most similar first.
+        """
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates |= self.buckets[band].get(key, set())
+
+        matches = []
+        for candidate in candidates:
+            similarity = estimate_similarity(signature, self.signatures[candidate])
+            if similarity >= threshold:
+                matches.append((candidate, similarity))
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+
+def sensor_constancy_sketch(df_track):
+    """
+    Summarises how much each sensor varies over a track.
+
+    Real devices always report some jitter in accuracy, satellites, speed and
+    bearing; scripted replays tend to report the exact same values.
+
+    Returns:
+        dict: Standard deviation of each column in `CONSTANCY_COLUMNS`.
+    """
+    return {
+        col: float(df_track[col].astype(float).std(ddof=0))
+        for col in CONSTANCY_COLUMNS if col in df_track.columns
+    }
+
+
+def is_constant_track(sketch):
+    """Returns True if every sensor in the sketch is constant."""
+    stds = [std for std in sketch.values() if not np.isnan(std)]
+    return bool(stds) and all(std <= CONSTANCY_STD_THRESHOLD for std in stds)
+
+
+def apply_fingerprints_to_dataframe(df_input):
+    """
+    Flags replayed and scripted trajectories via track fingerprints.
+
+    Each installation's recent path is reduced to a MinHash signature of its
+    geohash shingles. Installations are processed in order of the first
+    event of that recent window; a track is flagged if the LSH index already holds a similar track
+    from another installation, or if its sensor readings are constant.
+    Tracks covering fewer than `MIN_DISTINCT_CELLS` cells are neither
+    indexed nor matched.
+
+    Args:
+        df_input (pd.DataFrame): The input dataframe, expected to have the
+                                 schema from generate_data.py.
+
+    Returns:
+        pd.Series: A series of predictions (1 for spoofed, 0 for normal),
+                   aligned with the index of the input dataframe.
+    """
+    df = df_input.copy()
+
+    # --- 1. Data Preparation ---
+    # Sort by device and time so each group is a time-ordered track
+    df = df.sort_values(by=['installation_id', 'timestamp_unix'])
+    df['prediction'] = 0
+
+    # Order installations by when their fingerprinted window starts, not by
+    # their first event, so a long-installed bot replaying a newer track is
+    # still matched against the original rather than the other way around
+    recent = df.groupby('installation_id').tail(RECENT_TRACK_EVENTS)
+    window_start = recent.groupby('installation_id')['timestamp_unix'].min().sort_values()
+    grouped = recent.groupby('installation_id')
+
+    hasher = MinHasher()
+    index = TrajectoryIndex()
+
+    # --- 2. Fingerprint and Match Tracks ---
+    for installation_id in window_start.index:
+        df_track = grouped.get_group(installation_id)
+        if len(df_track) < MIN_TRACK_EVENTS:
+            continue
+
+        # Rule 1: Replayed Track
+        # The same path was already reported by a different installation.
+        # Devices that stay within a few cells (same office, mall or venue)
+        # share their cells by chance, so they are never matched.
+        is_replay = False
+        # Tracks without valid coordinates have no cells and are skipped too.
+        cells = quantize_track(df_track)
+        shingles = _shingles(cells)
+        if shingles and len(set(cells)) >= MIN_DISTINCT_CELLS:
+            signature = hasher.signature(shingles)
+            is_replay = len(index.query(signature)) > 0
+            index.add(installation_id, signature)
+
+        # Rule 2: Constant Sensors
+        # Accuracy, satellites, speed and bearing never change along the track.
+        is_constant = is_constant_track(sensor_constancy_sketch(df_track))
+
+        if is_replay or is_constant:
+            df.loc[df_track.index, 'prediction'] = 1
+
+    # --- 3. Return Predictions ---
+    # Ensure the output series is aligned with the original dataframe's index
+    return df['prediction'].reindex(df_input.index)
+
+
+def _self_check():
+    """
+    Runs the detector on deterministic synthetic tracks built with the
+    simulators from generate_data.py and checks the expected flags.
+    The global `random` and `np.random` states are restored afterwards.
+    Internal use function.
+
+    Raises:
+        RuntimeError: If any track is not flagged as expected.
+    """
+    import random
+
+    random_state, np_random_state = random.getstate(), np.random.get_state()
+    try:
+        random.seed(42)
+        np.random.seed(42)
+        flagged = _flag_self_check_tracks()
+    finally:
+        random.setstate(random_state)
+        np.random.set_state(np_random_state)
+
+    expected = {
+        'original': 0, 'replayed': 1, 'victim': 0, 'late_bot': 1, 'drive_a': 0, 'drive_b': 0,
+        'stationary_a': 0, 'stationary_b': 0, 'walker_a': 0, 'walker_b': 0,
+        'bot_replay': 1,
+    }
+    failures = []
+    for installation_id, expected_flag in expected.items():
+        status = "OK" if flagged[installation_id] == expected_flag else "FAIL"
+        print(f"{status}: {installation_id} flagged={flagged[installation_id]} expected={expected_flag}")
+        if status == "FAIL":
+            failures.append(installation_id)
+    if failures:
+        raise RuntimeError(f"Self-check failed for: {', '.join(failures)}")
+    print("Self-check passed.")
+
+
+def _flag_self_check_tracks():
+    """
+    Builds the self-check tracks and returns the per-installation flags.
+    Internal use function.
+    """
+    import random
+    from generate_data import (
+        BASE_LAT, BASE_LON, apply_bot_replay, generate_base_event,
+        simulate_driving_journey, simulate_stationary_or_walking_journey,
+    )
+
+    # ~3m of GPS noise, the jitter REPLAY_SIMILARITY_THRESHOLD was tuned on
+    GPS_JITTER_DEG = 0.00003
+
+    def to_track(events, installation_id):
+        df_track = pd.DataFrame(events)
+        df_track['installation_id'] = installation_id
+        return df_track
+
+    def stationary(start_time, n):
+        events = [generate_base_event(start_time + i * 10, BASE_LAT, BASE_LON) for i in range(n)]
+        for event in events:
+            event.update({"speed": 0, "bearing": 0})
+        return events
+
+    tracks = []
+
+    # Case 1: a jittered, time-shifted copy of a recorded drive
+    original = to_track(simulate_driving_journey(0, BASE_LAT, BASE_LON, 40), 'original')
+    replayed = original.copy()
+    replayed['installation_id'] = 'replayed'
+    replayed['timestamp_unix'] += 3600
+    replayed['latitude'] += np.random.normal(0, GPS_JITTER_DEG, len(replayed))
+    replayed['longitude'] += np.random.normal(0, GPS_JITTER_DEG, len(replayed))
+    replayed['horizontal_accuracy'] += np.random.normal(0, 0.5, len(replayed))
+    tracks += [original, replayed]
+
+    # Case 2: a bot installed before its victim, replaying the victim's drive
+    victim = to_track(simulate_driving_journey(10000, BASE_LAT, BASE_LON, 40), 'victim')
+    late_bot = victim.copy()
+    late_bot['timestamp_unix'] += 3600
+    late_bot['latitude'] += np.random.normal(0, GPS_JITTER_DEG, len(late_bot))
+    late_bot['longitude'] += np.random.normal(0, GPS_JITTER_DEG, len(late_bot))
+    late_bot = pd.concat([pd.DataFrame(stationary(0, 10)), late_bot], ignore_index=True)
+    late_bot['installation_id'] = 'late_bot'
+    tracks += [victim, late_bot]
+
+    # Case 3: two independent drives from different starting points
+    tracks.append(to_track(simulate_driving_journey(100, BASE_LAT + 0.05, BASE_LON, 40), 'drive_a'))
+    tracks.append(to_track(simulate_driving_journey(200, BASE_LAT, BASE_LON + 0.05, 40), 'drive_b'))
+
+    # Case 4: co-located devices that stay still or walk slowly
+    tracks.append(to_track(stationary(300, 20), 'stationary_a'))
+    tracks.append(to_track(stationary(400, 20), 'stationary_b'))
+    tracks.append(to_track(simulate_stationary_or_walking_journey(500, BASE_LAT, BASE_LON, 20), 'walker_a'))
+    tracks.append(to_track(simulate_stationary_or_walking_journey(600, BASE_LAT, BASE_LON, 20), 'walker_b'))
+
+    # Case 5: a bot_replay attack as produced by simulate_spoofed_journey
+    bot = apply_bot_replay(simulate_driving_journey(700, BASE_LAT - 0.05, BASE_LON, 40))
+    tracks.append(to_track(bot, 'bot_replay'))
+
+    df = pd.concat(tracks, ignore_index=True)
+    return apply_fingerprints_to_dataframe(df).groupby(df['installation_id']).max()
+
+# This file is intended to be used as a module.
+# Running it directly also performs a self-check on synthetic tracks.
+if __name__ == '__main__':
+    print("This script is a module and is meant to be imported.")
+    print("Example usage:")
+    print("from trajectory_fingerprint import apply_fingerprints_to_dataframe")
+    print("predictions = apply_fingerprints_to_dataframe(my_dataframe)")
+    print("\nRunning self-check on synthetic tracks...")
+    _self_check()